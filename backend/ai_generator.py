@@ -1,9 +1,67 @@
-import json
+import asyncio
+import functools
+from collections.abc import AsyncIterator
+from contextlib import AsyncExitStack
 from typing import Any
 
-import boto3
+import aioboto3
+import orjson
+from aiobotocore.config import AioConfig
 from botocore.exceptions import ClientError
 
+# Pool up to 64 connections per client and keep idle ones open for a minute,
+# so back-to-back queries reuse them instead of paying a new TLS handshake
+BEDROCK_CLIENT_CONFIG = AioConfig(
+    connector_args={"keepalive_timeout": 60},
+    max_pool_connections=64,
+    retries={"max_attempts": 3, "mode": "adaptive"},
+)
+
+# Models that Bedrock can serve with latency-optimized inference
+LATENCY_OPTIMIZED_MODELS = (
+    "anthropic.claude-3-5-haiku-20241022-v1:0",
+    "meta.llama3-1-70b-instruct-v1:0",
+    "meta.llama3-1-405b-instruct-v1:0",
+)
+
+
+# Yielded by generate_response_stream after a tool round that streamed text:
+# that text only led into the search and is not part of the final answer
+ROUND_BREAK = object()
+
+
+# Process-wide bedrock-runtime clients keyed on (region, config), so every
+# AIGenerator shares one connection pool instead of opening its own
+_CLIENT_CACHE: dict[tuple[str, AioConfig], Any] = {}
+_CLIENT_STACK = AsyncExitStack()
+_CLIENT_LOCK = asyncio.Lock()
+
+
+async def get_bedrock_client(region: str, config: AioConfig = BEDROCK_CLIENT_CONFIG):
+    """Return the shared bedrock-runtime client for a region, opening it on first use"""
+    key = (region, config)
+    client = _CLIENT_CACHE.get(key)
+    if client is not None:
+        return client
+
+    async with _CLIENT_LOCK:
+        # Another caller may have opened it while we waited for the lock
+        if key not in _CLIENT_CACHE:
+            client = await _CLIENT_STACK.enter_async_context(
+                aioboto3.Session().client(
+                    "bedrock-runtime", region_name=region, config=config
+                )
+            )
+            _CLIENT_CACHE[key] = client
+
+    return _CLIENT_CACHE[key]
+
+
+async def close_bedrock_clients():
+    """Close every shared bedrock-runtime client"""
+    await _CLIENT_STACK.aclose()
+    _CLIENT_CACHE.clear()
+
 
 class AIGenerator:
     """Handles interactions with AWS Bedrock Claude models for generating responses"""
@@ -13,11 +71,11 @@ class AIGenerator:
 
 Search Tool Usage:
 - Use the search tool **only** for questions about specific course content or detailed educational materials
-- **You can make multiple targeted searches (up to 2 rounds total)** for complex questions requiring:
+- **You can make multiple targeted searches in a single turn** for complex questions requiring:
   - Information from different courses or lessons
   - Comparisons between topics or courses
   - Multi-part questions needing separate searches
-- Each search should be targeted and build upon previous results
+- Each search should be targeted and cover a distinct part of the question
 - Synthesize all search results into accurate, fact-based responses
 - If search yields no results, state this clearly without offering alternatives
 
@@ -37,14 +95,52 @@ All responses must be:
 Provide only the direct answer to what was asked.
 """
 
-    def __init__(self, aws_region: str, model_id: str):
-        self.bedrock_client = boto3.client("bedrock-runtime", region_name=aws_region)
+    # System prompt as a cacheable content block for Bedrock prompt caching
+    SYSTEM_PROMPT_BLOCK = {
+        "type": "text",
+        "text": SYSTEM_PROMPT,
+        "cache_control": {"type": "ephemeral"},
+    }
+    SYSTEM_PROMPT_BLOCK_JSON = orjson.dumps(SYSTEM_PROMPT_BLOCK)
+
+    # Pre-encoded tool_choice fields, keyed on the choice type
+    TOOL_CHOICE_JSON = {
+        choice: b',"tool_choice":' + orjson.dumps({"type": choice})
+        for choice in ("auto", "none")
+    }
+
+    def __init__(self, aws_region: str, model_id: str, latency_optimized: bool = False):
+        self.aws_region = aws_region
         self.model_id = model_id
 
+        # Only request latency-optimized inference where the model supports it
+        # (plain or cross-region inference profile IDs such as "us.<model>")
+        self.latency_optimized = latency_optimized and model_id.endswith(
+            LATENCY_OPTIMIZED_MODELS
+        )
+
+        # Shared client, resolved by connect() or on the first Bedrock call
+        self.bedrock_client = None
+
         # Pre-build base inference parameters
         self.base_params = {"temperature": 0, "max_tokens": 800}
 
-    def generate_response(
+        # Static start of every request body, left open for per-call fields
+        self._body_prefix = orjson.dumps(
+            {"anthropic_version": "bedrock-2023-05-31", **self.base_params}
+        )[:-1]
+
+        # Tool definitions serialized on first use (tools are shared per process)
+        self._tools_source = None
+        self._tools_json = b""
+
+    async def connect(self):
+        """Resolve the shared bedrock-runtime client ahead of the first call"""
+        if self.bedrock_client is None:
+            self.bedrock_client = await get_bedrock_client(self.aws_region)
+        return self.bedrock_client
+
+    async def generate_response(
         self,
         query: str,
         conversation_history: str | None = None,
@@ -52,7 +148,13 @@ Provide only the direct answer to what was asked.
         tool_manager=None,
     ) -> str:
         """
-        Generate AI response with sequential tool calling support (up to 2 rounds).
+        Generate AI response with tool calling support (up to 2 rounds).
+
+        Round 1 may answer directly or request tool use. If it requests tools,
+        they are executed and round 2 is made with tool_choice "none": Bedrock
+        needs the tool definitions to read the tool_use and tool_result blocks,
+        but may not request more tools, so a query never costs more than 2
+        Bedrock calls.
 
         Args:
             query: The user's question or request
@@ -64,129 +166,348 @@ Provide only the direct answer to what was asked.
             Generated response as string
         """
         messages = [{"role": "user", "content": query}]
-        max_rounds = 2
 
-        # Loop through up to 2 rounds of tool calling
-        for _round_num in range(max_rounds):
-            # Make API call for this round
-            response = self._make_api_call(messages, tools, conversation_history)
+        # System content is identical for both rounds of this query
+        system_content = self._build_system(conversation_history)
 
-            if response is None:
-                return "Sorry, I encountered an error processing your request. Please try again."
+        # Round 1: answer directly or request tool use
+        response = await self._make_api_call(messages, system_content, tools)
+        if response is None:
+            return "Sorry, I encountered an error processing your request. Please try again."
 
-            # If no tool use or no tool manager, return response directly
-            if response.get("stop_reason") != "tool_use" or not tool_manager:
-                return self._extract_text_response(response)
+        # If no tool use or no tool manager, return response directly
+        if response.get("stop_reason") != "tool_use" or not tool_manager:
+            return self._extract_text_response(response)
 
-            # Execute tools and prepare for next round
-            messages = self._process_tool_round(messages, response, tool_manager)
-            if messages is None:  # Tool execution failed
-                return "Sorry, I encountered an error with the search tool. Please try again."
+        # Execute the requested tools
+        messages = await self._process_tool_round(messages, response, tool_manager)
+        if messages is None:  # Tool execution failed
+            return (
+                "Sorry, I encountered an error with the search tool. Please try again."
+            )
 
-        # After max rounds, make final call without tools
-        final_response = self._make_api_call(
-            messages, tools=None, conversation_history=conversation_history
+        # Round 2: final answer, with tools defined but no longer callable
+        final_response = await self._make_api_call(
+            messages, system_content, tools, tool_choice="none"
         )
         if final_response is None:
             return "Sorry, I encountered an error processing your request. Please try again."
 
         return self._extract_text_response(final_response)
 
-    def _make_api_call(
+    async def generate_response_stream(
+        self,
+        query: str,
+        conversation_history: str | None = None,
+        tools: list | None = None,
+        tool_manager=None,
+    ) -> AsyncIterator[str | object]:
+        """
+        Stream an AI response with the same tool calling rounds as
+        generate_response.
+
+        Text is yielded as soon as Bedrock produces it. When a round ends in
+        tool use, the tools are executed and the next round continues the
+        stream. If that round streamed text before requesting tools, ROUND_BREAK
+        is yielded first, so callers can keep the lead-in apart from the
+        answer that generate_response would return.
+
+        Args:
+            query: The user's question or request
+            conversation_history: Previous messages for context
+            tools: Available tools the AI can use
+            tool_manager: Manager to execute tools
+
+        Yields:
+            Chunks of generated response text, and ROUND_BREAK between rounds
+        """
+        messages = [{"role": "user", "content": query}]
+        system_content = self._build_system(conversation_history)
+
+        # Round 1 may use tools; round 2 is the final answer, with tools
+        # defined but no longer callable
+        for tool_choice in ("auto", "none"):
+            response = None
+            streamed_text = False
+            async for item in self._stream_api_call(
+                messages, system_content, tools, tool_choice
+            ):
+                if isinstance(item, dict):
+                    response = item
+                else:
+                    streamed_text = True
+                    yield item
+
+            if response is None:
+                yield "Sorry, I encountered an error processing your request. Please try again."
+                return
+
+            # Round 2 cannot request tools, so any tool_use there is ignored
+            if (
+                response.get("stop_reason") != "tool_use"
+                or not tool_manager
+                or tool_choice == "none"
+            ):
+                return
+
+            if streamed_text:
+                yield ROUND_BREAK
+
+            messages = await self._process_tool_round(messages, response, tool_manager)
+            if messages is None:  # Tool execution failed
+                yield "Sorry, I encountered an error with the search tool. Please try again."
+                return
+
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def _build_system(conversation_history: str | None) -> tuple[dict, ...]:
+        """
+        Build the system content blocks, memoized per conversation history.
+
+        The static prompt comes first so Bedrock can serve it from the prompt
+        cache; the per-session history follows the cache point. The blocks are
+        shared between calls and must not be mutated.
+
+        Args:
+            conversation_history: Previous conversation context
+
+        Returns:
+            Tuple of system content blocks
+        """
+        if not conversation_history:
+            return (AIGenerator.SYSTEM_PROMPT_BLOCK,)
+
+        return (
+            AIGenerator.SYSTEM_PROMPT_BLOCK,
+            {
+                "type": "text",
+                "text": f"Previous conversation:\n{conversation_history}",
+            },
+        )
+
+    async def _make_api_call(
         self,
         messages: list[dict],
+        system_content: tuple[dict, ...],
         tools: list | None = None,
-        conversation_history: str | None = None,
+        tool_choice: str = "auto",
     ) -> dict[str, Any] | None:
         """
         Make a single API call to Bedrock.
 
         Args:
             messages: List of conversation messages
+            system_content: System content blocks from _build_system
             tools: Available tools for this call
-            conversation_history: Previous conversation context
+            tool_choice: "auto" to let the model use tools, "none" to forbid it
 
         Returns:
             Response body from Bedrock API or None on error
         """
-        # Build system content efficiently
-        system_content = (
-            f"{self.SYSTEM_PROMPT}\n\nPrevious conversation:\n{conversation_history}"
-            if conversation_history
-            else self.SYSTEM_PROMPT
-        )
+        try:
+            # Make the request to Bedrock on the shared client
+            client = await self.connect()
+            response = await client.invoke_model(
+                **self._build_invoke_params(
+                    messages, system_content, tools, tool_choice
+                )
+            )
 
-        # Prepare the request body for Bedrock
-        request_body = {
-            "anthropic_version": "bedrock-2023-05-31",
-            "system": system_content,
-            "messages": messages,
-            **self.base_params,
-        }
+            # Parse and return the response
+            return orjson.loads(await response["body"].read())
 
-        # Add tools if available
-        if tools:
-            request_body["tools"] = tools
-            request_body["tool_choice"] = {"type": "auto"}
+        except ClientError as e:
+            print(f"Error calling Bedrock: {e}")
+            return None
+
+    async def _stream_api_call(
+        self,
+        messages: list[dict],
+        system_content: tuple[dict, ...],
+        tools: list | None = None,
+        tool_choice: str = "auto",
+    ) -> AsyncIterator[str | dict[str, Any]]:
+        """
+        Make a single streaming API call to Bedrock.
+
+        Args:
+            messages: List of conversation messages
+            system_content: System content blocks from _build_system
+            tools: Available tools for this call
+            tool_choice: "auto" to let the model use tools, "none" to forbid it
+
+        Yields:
+            Text deltas as they arrive, then the assembled response body
+            (content blocks and stop_reason). Nothing more is yielded on error.
+        """
+        content = []
+        tool_inputs = {}  # Partial JSON fragments per tool_use block index
+        stop_reason = None
 
         try:
-            # Make the request to Bedrock
-            response = self.bedrock_client.invoke_model(
-                modelId=self.model_id,
-                body=json.dumps(request_body),
-                contentType="application/json",
+            client = await self.connect()
+            response = await client.invoke_model_with_response_stream(
+                **self._build_invoke_params(
+                    messages, system_content, tools, tool_choice
+                )
             )
 
-            # Parse and return the response
-            return json.loads(response["body"].read())
+            async for event in response["body"]:
+                chunk = orjson.loads(event["chunk"]["bytes"])
+                chunk_type = chunk.get("type")
+
+                if chunk_type == "content_block_start":
+                    block = dict(chunk["content_block"])
+                    if block.get("type") == "tool_use":
+                        tool_inputs[chunk["index"]] = []
+                    content.append(block)
+
+                elif chunk_type == "content_block_delta":
+                    delta = chunk["delta"]
+                    if delta.get("type") == "text_delta":
+                        content[chunk["index"]]["text"] += delta["text"]
+                        yield delta["text"]
+                    elif delta.get("type") == "input_json_delta":
+                        tool_inputs[chunk["index"]].append(delta["partial_json"])
+
+                elif chunk_type == "message_delta":
+                    stop_reason = chunk["delta"].get("stop_reason", stop_reason)
 
         except ClientError as e:
             print(f"Error calling Bedrock: {e}")
-            return None
+            return
+
+        # Tool inputs arrive as JSON fragments; decode them once complete
+        for index, fragments in tool_inputs.items():
+            content[index]["input"] = orjson.loads("".join(fragments) or "{}")
 
-    def _process_tool_round(
+        yield {"content": content, "stop_reason": stop_reason}
+
+    def _build_invoke_params(
+        self,
+        messages: list[dict],
+        system_content: tuple[dict, ...],
+        tools: list | None = None,
+        tool_choice: str = "auto",
+    ) -> dict[str, Any]:
+        """
+        Build the invoke_model keyword arguments for a Bedrock call.
+
+        Args:
+            messages: List of conversation messages
+            system_content: System content blocks from _build_system
+            tools: Available tools for this call
+            tool_choice: "auto" to let the model use tools, "none" to forbid it
+
+        Returns:
+            Keyword arguments for invoke_model / invoke_model_with_response_stream
+        """
+        # Splice the per-call fields into the pre-serialized request body
+        body = [
+            self._body_prefix,
+            b',"system":',
+            self._serialize_system(system_content),
+            b',"messages":',
+            orjson.dumps(messages),
+        ]
+
+        # Add tools if available
+        if tools:
+            body += (
+                b',"tools":',
+                self._serialize_tools(tools),
+                self.TOOL_CHOICE_JSON[tool_choice],
+            )
+        body.append(b"}")
+
+        invoke_params = {
+            "modelId": self.model_id,
+            "body": b"".join(body),
+            "contentType": "application/json",
+        }
+        if self.latency_optimized:
+            invoke_params["performanceConfigLatency"] = "optimized"
+
+        return invoke_params
+
+    def _serialize_system(self, system_content: tuple[dict, ...]) -> bytes:
+        """Serialize system blocks, reusing the pre-encoded static prompt"""
+        return (
+            b"["
+            + b",".join(
+                (
+                    self.SYSTEM_PROMPT_BLOCK_JSON
+                    if block is self.SYSTEM_PROMPT_BLOCK
+                    else orjson.dumps(block)
+                )
+                for block in system_content
+            )
+            + b"]"
+        )
+
+    def _serialize_tools(self, tools: list) -> bytes:
+        """Serialize tool definitions once per tools list"""
+        if tools is not self._tools_source:
+            # Mark the end of the tool schema as a cacheable prefix
+            self._tools_json = orjson.dumps(
+                [*tools[:-1], {**tools[-1], "cache_control": {"type": "ephemeral"}}]
+            )
+            self._tools_source = tools
+        return self._tools_json
+
+    async def _process_tool_round(
         self, messages: list[dict], response: dict[str, Any], tool_manager
     ) -> list[dict] | None:
         """
         Execute tools and update message history for next round.
 
         Args:
-            messages: Current message history
+            messages: Current message history, extended in place
             response: API response containing tool use requests
             tool_manager: Manager to execute tools
 
         Returns:
-            Updated messages list or None on error
+            The same messages list or None on error
         """
         # Add AI's tool use response
-        updated_messages = messages.copy()
-        updated_messages.append({"role": "assistant", "content": response["content"]})
+        messages.append({"role": "assistant", "content": response["content"]})
+
+        # Run all tool calls of this round concurrently off the event loop
+        calls = [
+            content_block
+            for content_block in response["content"]
+            if content_block.get("type") == "tool_use"
+        ]
+        results = await asyncio.gather(
+            *(
+                asyncio.to_thread(
+                    tool_manager.execute_tool, call["name"], **call["input"]
+                )
+                for call in calls
+            ),
+            return_exceptions=True,
+        )
 
-        # Execute all tool calls and collect results
+        # Collect results in tool_use order
         tool_results = []
-        for content_block in response["content"]:
-            if content_block.get("type") == "tool_use":
-                try:
-                    tool_result = tool_manager.execute_tool(
-                        content_block["name"], **content_block["input"]
-                    )
-
-                    tool_results.append(
-                        {
-                            "type": "tool_result",
-                            "tool_use_id": content_block["id"],
-                            "content": tool_result,
-                        }
-                    )
-                except Exception as e:
-                    print(f"Error executing tool {content_block['name']}: {e}")
-                    return None
+        for call, tool_result in zip(calls, results, strict=True):
+            if isinstance(tool_result, Exception):
+                print(f"Error executing tool {call['name']}: {tool_result}")
+                return None
+
+            tool_results.append(
+                {
+                    "type": "tool_result",
+                    "tool_use_id": call["id"],
+                    "content": tool_result,
+                }
+            )
 
         # Add tool results as single message
         if tool_results:
-            updated_messages.append({"role": "user", "content": tool_results})
+            messages.append({"role": "user", "content": tool_results})
 
-        return updated_messages
+        return messages
 
     def _extract_text_response(self, response: dict[str, Any]) -> str:
         """
@@ -198,11 +519,8 @@ Provide only the direct answer to what was asked.
         Returns:
             Text content from response
         """
-        if not response or "content" not in response:
-            return "Sorry, I encountered an error processing your request. Please try again."
-
-        content = response["content"]
-        if content and isinstance(content, list) and len(content) > 0:
-            return content[0].get("text", "Sorry, I couldn't generate a response.")
-
-        return "Sorry, I couldn't generate a response."
+        # Successful responses always lead with a text block
+        try:
+            return response["content"][0]["text"]
+        except (KeyError, IndexError, TypeError):
+            return "Sorry, I couldn't generate a response."
@@ -1,19 +1,30 @@
+import asyncio
 import os
 import warnings
+from typing import Annotated
 
+import orjson
+from ai_generator import close_bedrock_clients
 from config import config
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 from rag_system import RAGSystem
 
 warnings.filterwarnings("ignore", message="resource_tracker: There appear to be.*")
 
+# Project root, so docs and frontend resolve from any working directory
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
 # Initialize FastAPI app
-app = FastAPI(title="Course Materials RAG System", root_path="")
+app = FastAPI(
+    title="Course Materials RAG System",
+    root_path="",
+    default_response_class=ORJSONResponse,
+)
 
 # Add trusted host middleware for proxy
 app.add_middleware(TrustedHostMiddleware, allowed_hosts=["*"])
@@ -32,6 +43,14 @@ app.add_middleware(
 rag_system = RAGSystem(config)
 
 
+def get_rag_system() -> RAGSystem:
+    """Provide the RAG system to endpoints; tests swap it via dependency_overrides"""
+    return rag_system
+
+
+RAGSystemDep = Annotated[RAGSystem, Depends(get_rag_system)]
+
+
 # Pydantic models for request/response
 class QueryRequest(BaseModel):
     """Request model for course queries"""
@@ -68,8 +87,10 @@ class CourseStats(BaseModel):
 # API Endpoints
 
 
-@app.post("/api/query", response_model=QueryResponse)
-async def query_documents(request: QueryRequest):
+# QueryResponse documents the schema without re-validating every response;
+# rag_system.query already returns source metadata in that shape
+@app.post("/api/query", responses={200: {"model": QueryResponse}})
+async def query_documents(request: QueryRequest, rag_system: RAGSystemDep):
     """Process a query and return response with sources"""
     try:
         # Create session if not provided
@@ -78,23 +99,47 @@ async def query_documents(request: QueryRequest):
             session_id = rag_system.session_manager.create_session()
 
         # Process query using RAG system
-        answer, sources, source_metadata = rag_system.query(request.query, session_id)
+        answer, sources, source_metadata = await rag_system.query(
+            request.query, session_id
+        )
 
-        # Convert source metadata to Pydantic models
-        metadata_models = [SourceMetadata(**meta) for meta in source_metadata]
+        return {
+            "answer": answer,
+            "sources": sources,
+            "source_metadata": source_metadata,
+            "session_id": session_id,
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
 
-        return QueryResponse(
-            answer=answer,
-            sources=sources,
-            source_metadata=metadata_models,
-            session_id=session_id,
-        )
+
+@app.post("/api/query/stream")
+async def query_documents_stream(request: QueryRequest, rag_system: RAGSystemDep):
+    """Process a query and stream the response as server-sent events"""
+    try:
+        # Create session if not provided
+        session_id = request.session_id
+        if not session_id:
+            session_id = rag_system.session_manager.create_session()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) from e
 
+    async def event_stream():
+        try:
+            async for event in rag_system.query_stream(request.query, session_id):
+                if event["type"] == "done":
+                    event["session_id"] = session_id
+                yield b"data: " + orjson.dumps(event) + b"\n\n"
+        except Exception as e:
+            # Headers are already sent, so report failures in-band
+            error = {"type": "error", "detail": str(e)}
+            yield b"data: " + orjson.dumps(error) + b"\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
 
 @app.get("/api/courses", response_model=CourseStats)
-async def get_course_stats():
+async def get_course_stats(rag_system: RAGSystemDep):
     """Get course analytics and statistics"""
     try:
         analytics = rag_system.get_course_analytics()
@@ -108,32 +153,64 @@ async def get_course_stats():
 
 @app.on_event("startup")
 async def startup_event():
-    """Load initial documents on startup"""
-    docs_path = "../docs"
+    """Open the shared Bedrock client and load initial documents on startup"""
+    await rag_system.ai_generator.connect()
+
+    docs_path = os.path.join(ROOT_DIR, "docs")
     if os.path.exists(docs_path):
         print("Loading initial documents...")
         try:
-            courses, chunks = rag_system.add_course_folder(
-                docs_path, clear_existing=False
+            # Parsing and embedding are blocking, so keep them off the event loop
+            courses, chunks = await asyncio.to_thread(
+                rag_system.add_course_folder, docs_path, clear_existing=False
             )
             print(f"Loaded {courses} courses with {chunks} chunks")
         except Exception as e:
             print(f"Error loading documents: {e}")
 
 
-# Custom static file handler with no-cache headers for development
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release the shared Bedrock clients on shutdown"""
+    await close_bedrock_clients()
+
+
+# No-cache headers for frontend assets during development
 
+NO_CACHE_HEADERS = [
+    (b"cache-control", b"no-cache, no-store, must-revalidate"),
+    (b"pragma", b"no-cache"),
+    (b"expires", b"0"),
+]
+STATIC_SUFFIXES = (".html", ".js", ".css", ".png", ".jpg", ".svg", ".ico", "/")
 
-class DevStaticFiles(StaticFiles):
-    async def get_response(self, path: str, scope):
-        response = await super().get_response(path, scope)
-        if isinstance(response, FileResponse):
-            # Add no-cache headers for development
-            response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
-            response.headers["Pragma"] = "no-cache"
-            response.headers["Expires"] = "0"
-        return response
 
+class NoCacheStatic:
+    """ASGI middleware that adds no-cache headers to frontend asset responses"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].endswith(STATIC_SUFFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_no_cache(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), *NO_CACHE_HEADERS]
+            await send(message)
+
+        await self.app(scope, receive, send_no_cache)
+
+
+# Production keeps the browser cache and StaticFiles' plain file responses
+if os.environ.get("ENV") == "dev":
+    app.add_middleware(NoCacheStatic)
 
 # Serve static files for the frontend
-app.mount("/", StaticFiles(directory="../frontend", html=True), name="static")
+app.mount(
+    "/",
+    StaticFiles(directory=os.path.join(ROOT_DIR, "frontend"), html=True),
+    name="static",
+)
@@ -16,6 +16,10 @@ class Config:
     BEDROCK_MODEL_ID: str = os.getenv(
         "BEDROCK_MODEL_ID", "anthropic.claude-3-5-sonnet-20241022-v2:0"
     )
+    # Use latency-optimized inference when the model supports it
+    BEDROCK_LATENCY_OPTIMIZED: bool = (
+        os.getenv("BEDROCK_LATENCY_OPTIMIZED", "true").lower() == "true"
+    )
 
     # Embedding model settings
     EMBEDDING_MODEL: str = "all-MiniLM-L6-v2"
@@ -1,7 +1,8 @@
 import os
+from collections.abc import AsyncIterator
 from typing import Any
 
-from ai_generator import AIGenerator
+from ai_generator import ROUND_BREAK, AIGenerator
 from document_processor import DocumentProcessor
 from models import Course
 from search_tools import CourseSearchTool, ToolManager
@@ -22,7 +23,11 @@ class RAGSystem:
         self.vector_store = VectorStore(
             config.CHROMA_PATH, config.EMBEDDING_MODEL, config.MAX_RESULTS
         )
-        self.ai_generator = AIGenerator(config.AWS_REGION, config.BEDROCK_MODEL_ID)
+        self.ai_generator = AIGenerator(
+            config.AWS_REGION,
+            config.BEDROCK_MODEL_ID,
+            config.BEDROCK_LATENCY_OPTIMIZED,
+        )
         self.session_manager = SessionManager(config.MAX_HISTORY)
 
         # Initialize search tools
@@ -115,7 +120,7 @@ class RAGSystem:
 
         return total_courses, total_chunks
 
-    def query(
+    async def query(
         self, query: str, session_id: str | None = None
     ) -> tuple[str, list[str], list[dict[str, Any]]]:
         """
@@ -136,20 +141,20 @@ class RAGSystem:
         if session_id:
             history = self.session_manager.get_conversation_history(session_id)
 
+        # Tools for this query only, so concurrent queries keep their sources apart
+        tool_manager = self.tool_manager.for_query()
+
         # Generate response using AI with tools
-        response = self.ai_generator.generate_response(
+        response = await self.ai_generator.generate_response(
             query=prompt,
             conversation_history=history,
-            tools=self.tool_manager.get_tool_definitions(),
-            tool_manager=self.tool_manager,
+            tools=tool_manager.get_tool_definitions(),
+            tool_manager=tool_manager,
         )
 
-        # Get sources and metadata from the search tool
-        sources = self.tool_manager.get_last_sources()
-        source_metadata = self.tool_manager.get_last_source_metadata()
-
-        # Reset sources after retrieving them
-        self.tool_manager.reset_sources()
+        # Get sources and metadata from this query's searches
+        sources = tool_manager.get_last_sources()
+        source_metadata = tool_manager.get_last_source_metadata()
 
         # Update conversation history
         if session_id:
@@ -158,6 +163,53 @@ class RAGSystem:
         # Return response with sources and metadata from tool searches
         return response, sources, source_metadata
 
+    async def query_stream(
+        self, query: str, session_id: str | None = None
+    ) -> AsyncIterator[dict[str, Any]]:
+        """
+        Process a user query like query(), streaming the response as it is generated.
+
+        Args:
+            query: User's question
+            session_id: Optional session ID for conversation context
+
+        Yields:
+            {"type": "delta", "text": ...} events while the answer streams, then
+            one {"type": "done", "sources": ..., "source_metadata": ...} event
+        """
+        prompt = f"""Answer this question about course materials: {query}"""
+
+        history = None
+        if session_id:
+            history = self.session_manager.get_conversation_history(session_id)
+
+        tool_manager = self.tool_manager.for_query()
+
+        # Stream the response, keeping the answer text for the session history
+        chunks = []
+        async for text in self.ai_generator.generate_response_stream(
+            query=prompt,
+            conversation_history=history,
+            tools=tool_manager.get_tool_definitions(),
+            tool_manager=tool_manager,
+        ):
+            if text is ROUND_BREAK:
+                # Save only the final answer, as query() does, and set the
+                # lead-in apart from it on screen
+                chunks.clear()
+                yield {"type": "delta", "text": "\n\n"}
+                continue
+            chunks.append(text)
+            yield {"type": "delta", "text": text}
+
+        sources = tool_manager.get_last_sources()
+        source_metadata = tool_manager.get_last_source_metadata()
+
+        if session_id:
+            self.session_manager.add_exchange(session_id, query, "".join(chunks))
+
+        yield {"type": "done", "sources": sources, "source_metadata": source_metadata}
+
     def get_course_analytics(self) -> dict:
         """Get analytics about the course catalog"""
         return {
@@ -1,3 +1,4 @@
+import copy
 from abc import ABC, abstractmethod
 from typing import Any
 
@@ -23,7 +24,7 @@ class CourseSearchTool(Tool):
 
     def __init__(self, vector_store: VectorStore):
         self.store = vector_store
-        self.last_sources = []  # Track sources from last search
+        self.last_sources = []  # Track sources of searches since the last reset
         self.last_source_metadata = []  # Track detailed source metadata
 
     def get_tool_definition(self) -> dict[str, Any]:
@@ -129,9 +130,10 @@ class CourseSearchTool(Tool):
             source_metadata.append(metadata)
             formatted.append(f"{header}\n{doc}")
 
-        # Store sources and metadata for retrieval
-        self.last_sources = sources
-        self.last_source_metadata = source_metadata
+        # Store sources and metadata for retrieval; a query may run several
+        # searches, so each adds to the lists rather than replacing them
+        self.last_sources.extend(sources)
+        self.last_source_metadata.extend(source_metadata)
 
         return "\n\n".join(formatted)
 
@@ -141,6 +143,7 @@ class ToolManager:
 
     def __init__(self):
         self.tools = {}
+        self.tool_definitions = []  # Built once per registration, not per query
 
     def register_tool(self, tool: Tool):
         """Register any tool that implements the Tool interface"""
@@ -149,10 +152,25 @@ class ToolManager:
         if not tool_name:
             raise ValueError("Tool must have a 'name' in its definition")
         self.tools[tool_name] = tool
+        self.tool_definitions = [t.get_tool_definition() for t in self.tools.values()]
+
+    def for_query(self) -> "ToolManager":
+        """
+        Return a manager over fresh copies of the tools, for a single query.
+
+        Tools record the sources they found on themselves, so concurrent
+        queries each need their own copies to keep their sources apart. The
+        copies share the (stateless) vector store and the tool definitions.
+        """
+        manager = ToolManager()
+        manager.tools = {name: copy.copy(tool) for name, tool in self.tools.items()}
+        manager.tool_definitions = self.tool_definitions
+        manager.reset_sources()
+        return manager
 
     def get_tool_definitions(self) -> list:
-        """Get all tool definitions for Anthropic tool calling"""
-        return [tool.get_tool_definition() for tool in self.tools.values()]
+        """Get all tool definitions for Anthropic tool calling (shared, do not mutate)"""
+        return self.tool_definitions
 
     def execute_tool(self, tool_name: str, **kwargs) -> str:
         """Execute a tool by name with given parameters"""
@@ -162,7 +180,7 @@ class ToolManager:
         return self.tools[tool_name].execute(**kwargs)
 
     def get_last_sources(self) -> list:
-        """Get sources from the last search operation"""
+        """Get sources from the searches since the last reset"""
         # Check all tools for last_sources attribute
         for tool in self.tools.values():
             if hasattr(tool, "last_sources") and tool.last_sources:
@@ -170,7 +188,7 @@ class ToolManager:
         return []
 
     def get_last_source_metadata(self) -> list:
-        """Get detailed source metadata from the last search operation"""
+        """Get detailed source metadata from the searches since the last reset"""
         # Check all tools for last_source_metadata attribute
         for tool in self.tools.values():
             if hasattr(tool, "last_source_metadata") and tool.last_source_metadata:
@@ -0,0 +1 @@
+# API test package initialization
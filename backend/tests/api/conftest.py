@@ -0,0 +1,210 @@
+from unittest.mock import AsyncMock, NonCallableMock, patch
+
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+from httpx import ASGITransport, AsyncClient
+
+# Import the real app without building its RAG system (ChromaDB, embedding model)
+with patch("rag_system.RAGSystem"):
+    import app as app_module
+
+# API request and expected response payloads
+
+_SAMPLE_QUERY_REQUEST = {
+    "query": "What are Python variables?",
+    "session_id": "test-session-123",
+}
+_SAMPLE_QUERY_REQUEST_NO_SESSION = {"query": "What are Python data types?"}
+_EXPECTED_QUERY_RESPONSE = {
+    "answer": "This is a test response about Python variables.",
+    "sources": ["Python Programming Basics - Lesson 1"],
+    "source_metadata": [
+        {
+            "name": "Python Programming Basics - Lesson 1",
+            "course": "Python Programming Basics",
+            "lesson": 1,
+            "link": "https://example.com/lesson1",
+        }
+    ],
+    "session_id": "test-session-123",
+}
+_EXPECTED_COURSE_STATS = {
+    "total_courses": 2,
+    "course_titles": ["Python Programming Basics", "Advanced Python"],
+}
+
+
+# Default mock RAG system return values, shared read-only between tests
+
+_DEFAULT_SOURCES = _EXPECTED_QUERY_RESPONSE["sources"]
+_SAMPLE_SOURCE_METADATA = _EXPECTED_QUERY_RESPONSE["source_metadata"]
+_DEFAULT_QUERY_RESULT = (
+    "This is a test response about Python variables.",
+    _DEFAULT_SOURCES,
+    _SAMPLE_SOURCE_METADATA,
+)
+_DEFAULT_COURSE_ANALYTICS = {
+    "total_courses": 2,
+    "course_titles": ["Python Programming Basics", "Advanced Python"],
+}
+
+
+async def _query_stream(query, session_id=None):
+    """Default streamed answer for mock RAG systems"""
+    yield {"type": "delta", "text": "This is a test "}
+    yield {"type": "delta", "text": "response about Python variables."}
+    yield {
+        "type": "done",
+        "sources": _DEFAULT_SOURCES,
+        "source_metadata": _SAMPLE_SOURCE_METADATA,
+    }
+
+
+def _configure_rag_system(mock_rag):
+    """Apply the default return values to a mock RAG system"""
+    # Mock session manager
+    mock_rag.session_manager.create_session.return_value = "test-session-123"
+
+    # Mock query and streaming query methods
+    mock_rag.query.return_value = _DEFAULT_QUERY_RESULT
+    mock_rag.query_stream.side_effect = _query_stream
+
+    # Mock course analytics
+    mock_rag.get_course_analytics.return_value = _DEFAULT_COURSE_ANALYTICS
+    return mock_rag
+
+
+def _make_rag_system():
+    """Build a new mock RAG system"""
+    mock_rag = NonCallableMock()
+    mock_rag.query = AsyncMock()
+    return _configure_rag_system(mock_rag)
+
+
+# Mock graph shared by mock_rag_system; only reset between tests
+_RAG_TEMPLATE = _make_rag_system()
+
+
+@pytest.fixture
+def mock_rag_system():
+    """
+    Mock RAG system for API testing.
+
+    Every test receives the same module-level mock, with calls, return values
+    and side effects reset to the defaults first.
+    """
+    _RAG_TEMPLATE.reset_mock(return_value=True, side_effect=True)
+    return _configure_rag_system(_RAG_TEMPLATE)
+
+
+@pytest.fixture(scope="session")
+def test_app():
+    """The real FastAPI app; endpoints get their RAG system from bind_rag"""
+    return app_module.app
+
+
+@pytest.fixture
+def bind_rag(test_app, mock_rag_system):
+    """Serve this test's mock_rag_system from the shared test app"""
+    test_app.dependency_overrides[app_module.get_rag_system] = lambda: mock_rag_system
+    yield mock_rag_system
+    test_app.dependency_overrides.clear()
+
+
+@pytest.fixture(scope="session")
+def session_client(test_app):
+    """Test client shared by all API tests"""
+    return TestClient(test_app)
+
+
+@pytest.fixture
+def client(session_client, bind_rag):
+    """Create test client for API testing"""
+    return session_client
+
+
+@pytest.fixture(scope="session")
+def session_no_cache_client(test_app):
+    """Test client with the dev-mode no-cache middleware around the app"""
+    return TestClient(app_module.NoCacheStatic(test_app))
+
+
+@pytest.fixture
+def no_cache_client(session_no_cache_client, bind_rag):
+    """Create no-cache test client for API testing"""
+    return session_no_cache_client
+
+
+def _request_once(test_app, client, method, url, payload=None):
+    """Send one request served by a fresh mock RAG system, then unbind it"""
+    rag = _make_rag_system()
+    test_app.dependency_overrides[app_module.get_rag_system] = lambda: rag
+    try:
+        if payload is None:
+            return client.request(method, url)
+        return client.request(
+            method,
+            url,
+            content=orjson.dumps(payload),
+            headers={"Content-Type": "application/json"},
+        )
+    finally:
+        test_app.dependency_overrides.clear()
+
+
+@pytest.fixture(scope="class")
+def query_response(test_app, session_client, sample_query_request):
+    """
+    One /api/query response shared by a test class.
+
+    For tests that only inspect the response; tests that configure or assert on
+    the RAG mock need their own request through client.
+    """
+    return _request_once(
+        test_app, session_client, "POST", "/api/query", sample_query_request
+    )
+
+
+@pytest.fixture(scope="class")
+def courses_response(test_app, session_client):
+    """One /api/courses response shared by a test class"""
+    return _request_once(test_app, session_client, "GET", "/api/courses")
+
+
+@pytest.fixture(scope="session")
+async def session_async_client(test_app):
+    """Async test client shared by all API tests"""
+    transport = ASGITransport(app=test_app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        yield ac
+
+
+@pytest.fixture
+def async_client(session_async_client, bind_rag):
+    """Create async test client for API testing"""
+    return session_async_client
+
+
+@pytest.fixture(scope="session")
+def sample_query_request():
+    """Sample query request for API testing"""
+    return _SAMPLE_QUERY_REQUEST
+
+
+@pytest.fixture(scope="session")
+def sample_query_request_no_session():
+    """Sample query request without session ID"""
+    return _SAMPLE_QUERY_REQUEST_NO_SESSION
+
+
+@pytest.fixture(scope="session")
+def expected_query_response():
+    """Expected query response for API testing"""
+    return _EXPECTED_QUERY_RESPONSE
+
+
+@pytest.fixture(scope="session")
+def expected_course_stats():
+    """Expected course statistics response"""
+    return _EXPECTED_COURSE_STATS
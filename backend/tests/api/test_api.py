@@ -0,0 +1,449 @@
+import asyncio
+import statistics
+import time
+
+import orjson
+import pytest
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# 10KB query, encoded once at import time
+_LARGE_QUERY_BODY = orjson.dumps({"query": "x" * 10000, "session_id": "test-large"})
+
+
+def _post(client, url, payload):
+    """POST a payload to the client, encoded with orjson"""
+    return client.post(url, content=orjson.dumps(payload), headers=_JSON_HEADERS)
+
+
+def _json(response):
+    """Decode a response body with orjson"""
+    return orjson.loads(response.content)
+
+
+# Raw /api/query bodies and the status each should get
+QUERY_BODY_CASES = (
+    pytest.param(orjson.dumps({"query": ""}), 200, id="empty_query"),
+    pytest.param(orjson.dumps({"session_id": "test-123"}), 422, id="missing_query"),
+    pytest.param(b"invalid json", 422, id="invalid_json"),
+)
+
+# Properties of a query response and the values each may take
+RESPONSE_FORMAT_CASES = (
+    pytest.param(
+        lambda r: r.headers["content-type"], {"application/json"}, id="json_content"
+    ),
+    # None means default UTF-8
+    pytest.param(lambda r: r.encoding, {"utf-8", None}, id="utf8_encoding"),
+)
+
+
+@pytest.mark.api
+class TestQueryEndpoint:
+    """Test cases for /api/query endpoint"""
+
+    def test_query_with_session_id(self, query_response, expected_query_response):
+        """Test query endpoint with provided session ID"""
+        assert query_response.status_code == 200
+        data = _json(query_response)
+
+        assert data["answer"] == expected_query_response["answer"]
+        assert data["sources"] == expected_query_response["sources"]
+        assert data["session_id"] == expected_query_response["session_id"]
+        assert len(data["source_metadata"]) == 1
+        assert (
+            data["source_metadata"][0]["name"] == "Python Programming Basics - Lesson 1"
+        )
+        assert data["source_metadata"][0]["course"] == "Python Programming Basics"
+        assert data["source_metadata"][0]["lesson"] == 1
+        assert data["source_metadata"][0]["link"] == "https://example.com/lesson1"
+
+    def test_query_without_session_id(
+        self, client, sample_query_request_no_session, mock_rag_system
+    ):
+        """Test query endpoint without session ID (should create new session)"""
+        response = _post(client, "/api/query", sample_query_request_no_session)
+
+        assert response.status_code == 200
+        data = _json(response)
+
+        assert data["session_id"] == "test-session-123"
+        assert data["answer"] == "This is a test response about Python variables."
+        assert len(data["sources"]) > 0
+
+        # Verify session creation was called
+        mock_rag_system.session_manager.create_session.assert_called_once()
+
+    @pytest.mark.parametrize("body,expected_status", QUERY_BODY_CASES)
+    def test_query_request_bodies(self, client, body, expected_status):
+        """Test query endpoint with empty, incomplete and malformed bodies"""
+        response = client.post("/api/query", content=body, headers=_JSON_HEADERS)
+
+        assert response.status_code == expected_status
+        if expected_status == 200:
+            # Should still return valid response structure
+            data = _json(response)
+            assert "answer" in data
+            assert "sources" in data
+            assert "session_id" in data
+
+    def test_query_rag_system_error(
+        self, client, sample_query_request, mock_rag_system
+    ):
+        """Test query endpoint when RAG system raises an error"""
+        mock_rag_system.query.side_effect = Exception("RAG system error")
+
+        response = _post(client, "/api/query", sample_query_request)
+
+        assert response.status_code == 500
+        assert "RAG system error" in _json(response)["detail"]
+
+    def test_query_session_manager_error(
+        self, client, sample_query_request_no_session, mock_rag_system
+    ):
+        """Test query endpoint when session manager raises an error"""
+        mock_rag_system.session_manager.create_session.side_effect = Exception(
+            "Session error"
+        )
+
+        response = _post(client, "/api/query", sample_query_request_no_session)
+
+        assert response.status_code == 500
+        assert "Session error" in _json(response)["detail"]
+
+    def test_query_response_schema(self, query_response):
+        """Test that query response matches expected schema"""
+        assert query_response.status_code == 200
+        data = _json(query_response)
+
+        required_fields = ["answer", "sources", "source_metadata", "session_id"]
+        for field in required_fields:
+            assert field in data
+
+        assert isinstance(data["answer"], str)
+        assert isinstance(data["sources"], list)
+        assert isinstance(data["source_metadata"], list)
+        assert isinstance(data["session_id"], str)
+
+        if data["source_metadata"]:
+            metadata = data["source_metadata"][0]
+            assert "name" in metadata
+            assert "course" in metadata
+            assert "lesson" in metadata or metadata["lesson"] is None
+            assert "link" in metadata or metadata["link"] is None
+
+
+@pytest.mark.api
+class TestQueryStreamEndpoint:
+    """Test cases for /api/query/stream endpoint"""
+
+    @staticmethod
+    def _events(response):
+        return [
+            orjson.loads(line[len(b"data: ") :])
+            for line in response.content.splitlines()
+            if line.startswith(b"data: ")
+        ]
+
+    def test_stream_deltas_then_done(self, client, sample_query_request):
+        """Test that the stream sends text deltas followed by sources"""
+        response = _post(client, "/api/query/stream", sample_query_request)
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+
+        events = self._events(response)
+        text = "".join(e["text"] for e in events if e["type"] == "delta")
+        assert text == "This is a test response about Python variables."
+
+        done = events[-1]
+        assert done["type"] == "done"
+        assert done["sources"] == ["Python Programming Basics - Lesson 1"]
+        assert done["session_id"] == "test-session-123"
+
+    def test_stream_creates_session(
+        self, client, sample_query_request_no_session, mock_rag_system
+    ):
+        """Test that a session is created when none is provided"""
+        response = _post(client, "/api/query/stream", sample_query_request_no_session)
+
+        assert response.status_code == 200
+        assert self._events(response)[-1]["session_id"] == "test-session-123"
+        mock_rag_system.session_manager.create_session.assert_called_once()
+
+    def test_stream_error_reported_in_band(
+        self, client, sample_query_request, mock_rag_system
+    ):
+        """Test that errors raised mid-stream arrive as an error event"""
+        mock_rag_system.query_stream.side_effect = Exception("Stream error")
+
+        response = _post(client, "/api/query/stream", sample_query_request)
+
+        assert response.status_code == 200
+        assert self._events(response) == [{"type": "error", "detail": "Stream error"}]
+
+
+@pytest.mark.api
+class TestCoursesEndpoint:
+    """Test cases for /api/courses endpoint"""
+
+    def test_get_courses_success(self, courses_response, expected_course_stats):
+        """Test courses endpoint successful response"""
+        assert courses_response.status_code == 200
+        data = _json(courses_response)
+
+        assert data["total_courses"] == expected_course_stats["total_courses"]
+        assert data["course_titles"] == expected_course_stats["course_titles"]
+
+    def test_get_courses_empty_response(self, client, mock_rag_system):
+        """Test courses endpoint with no courses"""
+        mock_rag_system.get_course_analytics.return_value = {
+            "total_courses": 0,
+            "course_titles": [],
+        }
+
+        response = client.get("/api/courses")
+
+        assert response.status_code == 200
+        data = _json(response)
+
+        assert data["total_courses"] == 0
+        assert data["course_titles"] == []
+
+    def test_get_courses_rag_system_error(self, client, mock_rag_system):
+        """Test courses endpoint when RAG system raises an error"""
+        mock_rag_system.get_course_analytics.side_effect = Exception("Analytics error")
+
+        response = client.get("/api/courses")
+
+        assert response.status_code == 500
+        assert "Analytics error" in _json(response)["detail"]
+
+    def test_get_courses_response_schema(self, courses_response):
+        """Test that courses response matches expected schema"""
+        assert courses_response.status_code == 200
+        data = _json(courses_response)
+
+        required_fields = ["total_courses", "course_titles"]
+        for field in required_fields:
+            assert field in data
+
+        assert isinstance(data["total_courses"], int)
+        assert isinstance(data["course_titles"], list)
+        assert data["total_courses"] >= 0
+
+        if data["course_titles"]:
+            for title in data["course_titles"]:
+                assert isinstance(title, str)
+
+
+@pytest.mark.api
+class TestAPIIntegration:
+    """Integration tests for API endpoints"""
+
+    def test_query_then_courses_workflow(self, client, sample_query_request):
+        """Test typical workflow: query documents then get course stats"""
+        # First, make a query
+        query_response = _post(client, "/api/query", sample_query_request)
+        assert query_response.status_code == 200
+
+        # Then get course statistics
+        courses_response = client.get("/api/courses")
+        assert courses_response.status_code == 200
+
+        query_data = _json(query_response)
+        courses_data = _json(courses_response)
+
+        assert query_data["session_id"] is not None
+        assert courses_data["total_courses"] > 0
+
+    def test_multiple_queries_same_session(self, client, mock_rag_system):
+        """Test multiple queries using the same session ID"""
+        session_id = "test-session-persistent"
+
+        # First query
+        response1 = _post(
+            client, "/api/query", {"query": "What is Python?", "session_id": session_id}
+        )
+        assert response1.status_code == 200
+        assert _json(response1)["session_id"] == session_id
+
+        # Second query with same session
+        response2 = _post(
+            client,
+            "/api/query",
+            {"query": "What are variables?", "session_id": session_id},
+        )
+        assert response2.status_code == 200
+        assert _json(response2)["session_id"] == session_id
+
+        # Verify both calls were made to RAG system
+        assert mock_rag_system.query.call_count == 2
+
+    async def test_query_with_async_client(self, async_client, sample_query_request):
+        """Test a query through the shared async client"""
+        response = await _post(async_client, "/api/query", sample_query_request)
+
+        assert response.status_code == 200
+        assert _json(response)["session_id"] == "test-session-123"
+
+    @pytest.mark.slow
+    async def test_concurrent_requests(
+        self, async_client, sample_query_request, mock_rag_system
+    ):
+        """Test handling of concurrent requests"""
+        # Make 5 concurrent requests on the app's event loop
+        responses = await asyncio.gather(
+            *(_post(async_client, "/api/query", sample_query_request) for _ in range(5))
+        )
+        assert mock_rag_system.query.await_count == 5
+
+        # All requests should succeed
+        for response in responses:
+            assert response.status_code == 200
+            data = _json(response)
+            assert "answer" in data
+            assert "session_id" in data
+
+
+@pytest.mark.api
+class TestAPIErrorHandling:
+    """Test error handling across API endpoints"""
+
+    def test_malformed_request_body(self, client):
+        """Test handling of malformed request bodies"""
+        # Test with malformed JSON for query endpoint
+        response = client.post(
+            "/api/query",
+            content=b'{"query": "test", invalid}',
+            headers=_JSON_HEADERS,
+        )
+        assert response.status_code == 422
+
+    def test_wrong_http_methods(self, client):
+        """Test using wrong HTTP methods on endpoints"""
+        # GET on query endpoint (should be POST) falls through to the static
+        # file mount, which finds no such file
+        response = client.get("/api/query")
+        assert response.status_code == 404
+
+        # POST on courses endpoint (should be GET)
+        response = _post(client, "/api/courses", {"test": "data"})
+        assert response.status_code == 405
+
+    def test_nonexistent_endpoints(self, client):
+        """Test requests to nonexistent endpoints"""
+        response = client.get("/api/nonexistent")
+        assert response.status_code == 404
+
+        # The static file mount catches unknown paths and only allows GET/HEAD
+        response = _post(client, "/api/invalid", {"test": "data"})
+        assert response.status_code == 405
+
+    @pytest.mark.slow
+    def test_large_query_payload(self, client):
+        """Test handling of very large query payload"""
+        response = client.post(
+            "/api/query", content=_LARGE_QUERY_BODY, headers=_JSON_HEADERS
+        )
+
+        # Should handle large payloads gracefully
+        assert response.status_code in [200, 413]  # OK or Payload Too Large
+
+
+@pytest.mark.api
+@pytest.mark.slow
+class TestAPIPerformance:
+    """Performance tests for API endpoints"""
+
+    @staticmethod
+    def _median_latency(send, runs=3):
+        """Median latency of send() over a few runs, after one untimed warmup"""
+        response = send()
+        assert response.status_code == 200
+
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            response = send()
+            times.append(time.perf_counter() - start)
+            assert response.status_code == 200
+        return statistics.median(times)
+
+    def test_query_response_time(self, client, sample_query_request):
+        """Test that query endpoint responds within reasonable time"""
+        latency = self._median_latency(
+            lambda: _post(client, "/api/query", sample_query_request)
+        )
+
+        assert latency < 0.2  # Should respond within 200ms
+
+    def test_courses_response_time(self, client):
+        """Test that courses endpoint responds within reasonable time"""
+        latency = self._median_latency(lambda: client.get("/api/courses"))
+
+        assert latency < 0.2  # Should respond within 200ms
+
+
+@pytest.mark.api
+class TestAPIContentTypes:
+    """Test different content types and headers"""
+
+    @pytest.mark.parametrize("probe,allowed", RESPONSE_FORMAT_CASES)
+    def test_response_format(self, query_response, probe, allowed):
+        """Test the content type and encoding of a query response"""
+        assert query_response.status_code == 200
+        assert probe(query_response) in allowed
+
+    def test_cors_headers(self, client):
+        """Test CORS headers are present"""
+        response = client.options("/api/query")
+
+        # CORS headers should be present due to middleware
+        assert response.status_code in [
+            200,
+            405,
+        ]  # OPTIONS might not be explicitly handled
+
+        # A preflight request is answered by the middleware itself
+        response = client.options(
+            "/api/query",
+            headers={
+                "Origin": "http://localhost:8000",
+                "Access-Control-Request-Method": "POST",
+            },
+        )
+        assert response.status_code == 200
+        assert response.headers["access-control-allow-origin"] in [
+            "*",
+            "http://localhost:8000",
+        ]
+
+
+NO_CACHE_HEADERS = {
+    "cache-control": "no-cache, no-store, must-revalidate",
+    "pragma": "no-cache",
+    "expires": "0",
+}
+
+
+@pytest.mark.api
+class TestNoCacheStatic:
+    """Test the dev-mode no-cache headers on frontend assets"""
+
+    @pytest.mark.parametrize("path", ["/", "/index.html", "/script.js", "/style.css"])
+    def test_asset_gets_no_cache_headers(self, no_cache_client, path):
+        """Test that frontend assets are served with all three no-cache headers"""
+        response = no_cache_client.get(path)
+
+        assert response.status_code == 200
+        for header, value in NO_CACHE_HEADERS.items():
+            assert response.headers[header] == value
+
+    def test_api_response_left_cacheable(self, no_cache_client):
+        """Test that API responses don't get the no-cache headers"""
+        response = no_cache_client.get("/api/courses")
+
+        assert response.status_code == 200
+        for header in NO_CACHE_HEADERS:
+            assert header not in response.headers
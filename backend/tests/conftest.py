@@ -1,6 +1,7 @@
+import json
 import os
 import sys
-from unittest.mock import Mock, patch
+from unittest.mock import Mock, NonCallableMagicMock, NonCallableMock, patch
 
 import pytest
 
@@ -8,13 +9,88 @@ import pytest
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
 from config import Config
-from models import Course, CourseChunk, Lesson
+from models import CourseChunk
+from search_tools import CourseSearchTool, ToolManager
 from vector_store import SearchResults
 
-
-@pytest.fixture
-def mock_config():
-    """Mock configuration for testing"""
+# Default mock return values, built once and shared read-only between mocks
+
+_DEFAULT_LESSON_LINK = "https://example.com/lesson1"
+_DEFAULT_COURSE_TITLES = ["Python Programming Basics"]
+_DEFAULT_TOOL_DEFS = [
+    {
+        "name": "search_course_content",
+        "description": "Search course materials",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "query": {"type": "string"},
+                "course_name": {"type": "string"},
+                "lesson_number": {"type": "integer"},
+            },
+            "required": ["query"],
+        },
+    }
+]
+_DEFAULT_SOURCES = ["Python Programming Basics - Lesson 1"]
+_SAMPLE_SOURCE_METADATA = [
+    {
+        "name": "Python Programming Basics - Lesson 1",
+        "course": "Python Programming Basics",
+        "lesson": 1,
+        "link": "https://example.com/lesson1",
+    }
+]
+
+
+# Sample course chunks, built once at import time. CourseChunk is a mutable
+# pydantic model, so tests must treat these as read-only.
+_SAMPLE_CHUNKS = (
+    CourseChunk(
+        content="Course Python Programming Basics Lesson 1 content: Python is a powerful programming language used for web development, data science, and automation.",
+        course_title="Python Programming Basics",
+        lesson_number=1,
+        chunk_index=0,
+    ),
+    CourseChunk(
+        content="Course Python Programming Basics Lesson 1 content: Python was created by Guido van Rossum and first released in 1991.",
+        course_title="Python Programming Basics",
+        lesson_number=1,
+        chunk_index=1,
+    ),
+)
+
+
+# Search results over the sample chunks, plus empty, error and unknown-course
+# results; shared read-only like the chunks above
+_SAMPLE_SEARCH_RESULTS = SearchResults(
+    documents=[chunk.content for chunk in _SAMPLE_CHUNKS],
+    metadata=[
+        {
+            "course_title": chunk.course_title,
+            "lesson_number": chunk.lesson_number,
+            "chunk_index": chunk.chunk_index,
+        }
+        for chunk in _SAMPLE_CHUNKS
+    ],
+    distances=[0.1, 0.2],
+)
+_EMPTY_SEARCH_RESULTS = SearchResults(documents=[], metadata=[], distances=[])
+_ERROR_SEARCH_RESULTS = SearchResults.empty("Test error message")
+_UNKNOWN_COURSE_SEARCH_RESULTS = SearchResults.empty(
+    "No course found matching 'Nonexistent Course'"
+)
+
+
+@pytest.fixture(scope="session")
+def mock_config(tmp_path_factory):
+    """
+    Mock configuration for testing.
+
+    CHROMA_PATH points at a fresh temporary directory per session, so each
+    pytest-xdist worker gets its own. Tests that open a real Chroma store must
+    use mock_config.CHROMA_PATH rather than a hardcoded path.
+    """
     config = Config()
     config.AWS_REGION = "us-east-1"
     config.BEDROCK_MODEL_ID = "anthropic.claude-3-5-sonnet-20241022-v2:0"
@@ -22,480 +98,162 @@ def mock_config():
     config.CHUNK_OVERLAP = 100
     config.MAX_RESULTS = 5
     config.MAX_HISTORY = 2
-    config.CHROMA_PATH = "./test_chroma_db"
+    config.CHROMA_PATH = str(tmp_path_factory.mktemp("chroma"))
     config.EMBEDDING_MODEL = "all-MiniLM-L6-v2"
     return config
 
 
-@pytest.fixture
-def sample_course():
-    """Sample course data for testing"""
-    lessons = [
-        Lesson(
-            lesson_number=1,
-            title="Introduction to Python",
-            lesson_link="https://example.com/lesson1",
-        ),
-        Lesson(
-            lesson_number=2,
-            title="Variables and Data Types",
-            lesson_link="https://example.com/lesson2",
-        ),
-        Lesson(
-            lesson_number=3,
-            title="Control Structures",
-            lesson_link="https://example.com/lesson3",
-        ),
-    ]
-
-    return Course(
-        title="Python Programming Basics",
-        course_link="https://example.com/python-course",
-        instructor="John Doe",
-        lessons=lessons,
-    )
-
-
-@pytest.fixture
-def sample_course_chunks(sample_course):
-    """Sample course chunks for testing"""
-    chunks = [
-        CourseChunk(
-            content="Course Python Programming Basics Lesson 1 content: Python is a powerful programming language used for web development, data science, and automation.",
-            course_title="Python Programming Basics",
-            lesson_number=1,
-            chunk_index=0,
-        ),
-        CourseChunk(
-            content="Course Python Programming Basics Lesson 1 content: Python was created by Guido van Rossum and first released in 1991.",
-            course_title="Python Programming Basics",
-            lesson_number=1,
-            chunk_index=1,
-        ),
-        CourseChunk(
-            content="Course Python Programming Basics Lesson 2 content: Variables in Python are used to store data values. Python has different data types including strings, integers, and floats.",
-            course_title="Python Programming Basics",
-            lesson_number=2,
-            chunk_index=2,
-        ),
-        CourseChunk(
-            content="Course Python Programming Basics Lesson 3 content: Control structures like if statements and loops allow you to control the flow of your program.",
-            course_title="Python Programming Basics",
-            lesson_number=3,
-            chunk_index=3,
-        ),
-    ]
-    return chunks
-
-
-@pytest.fixture
-def sample_search_results(sample_course_chunks):
+@pytest.fixture(scope="session")
+def sample_search_results():
     """Sample search results for testing"""
-    return SearchResults(
-        documents=[chunk.content for chunk in sample_course_chunks[:2]],
-        metadata=[
-            {
-                "course_title": chunk.course_title,
-                "lesson_number": chunk.lesson_number,
-                "chunk_index": chunk.chunk_index,
-            }
-            for chunk in sample_course_chunks[:2]
-        ],
-        distances=[0.1, 0.2],
-    )
+    return _SAMPLE_SEARCH_RESULTS
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def empty_search_results():
     """Empty search results for testing"""
-    return SearchResults(documents=[], metadata=[], distances=[])
+    return _EMPTY_SEARCH_RESULTS
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def error_search_results():
     """Error search results for testing"""
-    return SearchResults.empty("Test error message")
+    return _ERROR_SEARCH_RESULTS
+
+
+@pytest.fixture(scope="session")
+def unknown_course_search_results():
+    """Search results for a course name that matches no course"""
+    return _UNKNOWN_COURSE_SEARCH_RESULTS
 
 
 @pytest.fixture
 def mock_vector_store():
     """Mock vector store for testing"""
-    mock_store = Mock()
+    mock_store = NonCallableMock()
     mock_store.search = Mock()
-    mock_store.get_lesson_link = Mock(return_value="https://example.com/lesson1")
+    mock_store.get_lesson_link = Mock(return_value=_DEFAULT_LESSON_LINK)
     mock_store.add_course_metadata = Mock()
     mock_store.add_course_content = Mock()
-    mock_store.get_existing_course_titles = Mock(
-        return_value=["Python Programming Basics"]
-    )
+    mock_store.get_existing_course_titles = Mock(return_value=_DEFAULT_COURSE_TITLES)
     mock_store.get_course_count = Mock(return_value=1)
     return mock_store
 
 
 @pytest.fixture
-def mock_bedrock_client():
-    """Mock AWS Bedrock client for testing"""
-    mock_client = Mock()
-
-    # Mock successful response without tools
-    mock_response_body = {
-        "content": [{"text": "This is a test response from Claude."}],
-        "stop_reason": "end_turn",
-    }
-
-    mock_response = {"body": Mock()}
-    mock_response["body"].read.return_value = Mock()
-    mock_response["body"].read.return_value = str.encode(
-        str(mock_response_body).replace("'", '"')
-    )
-
-    mock_client.invoke_model.return_value = mock_response
-    return mock_client
+def search_tool(mock_vector_store):
+    """CourseSearchTool backed by this test's mock vector store"""
+    return CourseSearchTool(mock_vector_store)
 
 
 @pytest.fixture
-def mock_tool_use_response():
-    """Mock Bedrock response that includes tool use"""
-    return {
-        "content": [
-            {
-                "type": "tool_use",
-                "id": "tool_12345",
-                "name": "search_course_content",
-                "input": {
-                    "query": "Python variables",
-                    "course_name": "Python Programming",
-                },
-            }
-        ],
-        "stop_reason": "tool_use",
-    }
+def tool_manager(search_tool):
+    """ToolManager with search_tool registered"""
+    manager = ToolManager()
+    manager.register_tool(search_tool)
+    return manager
 
 
-@pytest.fixture
-def mock_final_response():
-    """Mock final response after tool execution"""
-    return {
-        "content": [
-            {
-                "text": "Based on the search results, variables in Python are used to store data values."
-            }
-        ],
-        "stop_reason": "end_turn",
-    }
+class FakeBody:
+    """Minimal invoke_model body whose async read() returns fixed bytes"""
 
+    __slots__ = ("_payload",)
 
-@pytest.fixture
-def mock_session_manager():
-    """Mock session manager for testing"""
-    mock_manager = Mock()
-    mock_manager.get_conversation_history = Mock(return_value=None)
-    mock_manager.add_exchange = Mock()
-    return mock_manager
+    def __init__(self, payload: bytes):
+        self._payload = payload
 
+    async def read(self) -> bytes:
+        return self._payload
 
-@pytest.fixture
-def mock_tool_manager():
-    """Mock tool manager for testing"""
-    mock_manager = Mock()
-    mock_manager.get_tool_definitions = Mock(
-        return_value=[
-            {
-                "name": "search_course_content",
-                "description": "Search course materials",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "query": {"type": "string"},
-                        "course_name": {"type": "string"},
-                        "lesson_number": {"type": "integer"},
-                    },
-                    "required": ["query"],
-                },
-            }
-        ]
-    )
-    mock_manager.execute_tool = Mock(return_value="Mocked search results")
-    mock_manager.get_last_sources = Mock(
-        return_value=["Python Programming Basics - Lesson 1"]
-    )
-    mock_manager.get_last_source_metadata = Mock(
-        return_value=[
-            {
-                "name": "Python Programming Basics - Lesson 1",
-                "course": "Python Programming Basics",
-                "lesson": 1,
-                "link": "https://example.com/lesson1",
-            }
-        ]
-    )
-    mock_manager.reset_sources = Mock()
-    return mock_manager
 
+@pytest.fixture(scope="session")
+def make_bedrock_response():
+    """
+    Factory for invoke_model responses, built once per distinct body.
 
-@pytest.fixture
-def course_search_test_cases():
-    """Test cases for CourseSearchTool testing"""
-    return [
-        {
-            "name": "successful_search_with_results",
-            "query": "Python variables",
-            "course_name": None,
-            "lesson_number": None,
-            "expected_results": True,
-            "expected_error": None,
-        },
-        {
-            "name": "successful_search_with_course_filter",
-            "query": "Python basics",
-            "course_name": "Python Programming",
-            "lesson_number": None,
-            "expected_results": True,
-            "expected_error": None,
-        },
-        {
-            "name": "successful_search_with_lesson_filter",
-            "query": "variables",
-            "course_name": "Python Programming",
-            "lesson_number": 2,
-            "expected_results": True,
-            "expected_error": None,
-        },
-        {
-            "name": "empty_results",
-            "query": "nonexistent topic",
-            "course_name": None,
-            "lesson_number": None,
-            "expected_results": False,
-            "expected_error": None,
-        },
-        {
-            "name": "invalid_course",
-            "query": "anything",
-            "course_name": "Nonexistent Course",
-            "lesson_number": None,
-            "expected_results": False,
-            "expected_error": "No course found matching 'Nonexistent Course'",
-        },
-        {
-            "name": "search_error",
-            "query": "test query",
-            "course_name": None,
-            "lesson_number": None,
-            "expected_results": False,
-            "expected_error": "Search error: Test database error",
-        },
-    ]
+    Accepts a response dict or already-encoded bytes. Responses are cached on
+    the body's identity (the body is kept alive alongside it), so repeated
+    calls with the same object share one envelope; treat it as read-only.
+    """
+    cache = {}
 
+    def _make(body):
+        key = id(body)
+        if key not in cache:
+            payload = body if isinstance(body, bytes) else json.dumps(body).encode()
+            cache[key] = (body, {"body": FakeBody(payload)})
+        return cache[key][1]
 
-@pytest.fixture
-def ai_generator_test_cases():
-    """Test cases for AIGenerator testing"""
-    return [
-        {
-            "name": "simple_query_no_tools",
-            "query": "What is 2+2?",
-            "tools": None,
-            "expected_tool_use": False,
-            "expected_response_contains": "4",
-        },
-        {
-            "name": "course_content_query_with_tools",
-            "query": "Tell me about Python variables",
-            "tools": [{"name": "search_course_content"}],
-            "expected_tool_use": True,
-            "expected_response_contains": "variables",
-        },
-        {
-            "name": "general_programming_question",
-            "query": "What are the benefits of object-oriented programming?",
-            "tools": [{"name": "search_course_content"}],
-            "expected_tool_use": False,
-            "expected_response_contains": "object-oriented",
-        },
-    ]
-
+    return _make
 
-# API Testing Fixtures
 
-
-@pytest.fixture
-def mock_rag_system():
-    """Mock RAG system for API testing"""
-    mock_rag = Mock()
-
-    # Mock session manager
-    mock_session_manager = Mock()
-    mock_session_manager.create_session.return_value = "test-session-123"
-    mock_rag.session_manager = mock_session_manager
-
-    # Mock query method
-    mock_rag.query.return_value = (
-        "This is a test response about Python variables.",
-        ["Python Programming Basics - Lesson 1"],
-        [
-            {
-                "name": "Python Programming Basics - Lesson 1",
-                "course": "Python Programming Basics",
-                "lesson": 1,
-                "link": "https://example.com/lesson1",
-            }
-        ],
-    )
-
-    # Mock course analytics
-    mock_rag.get_course_analytics.return_value = {
-        "total_courses": 2,
-        "course_titles": ["Python Programming Basics", "Advanced Python"],
-    }
-
-    return mock_rag
+def _configure_tool_manager(mock_manager):
+    """Apply the default return values to a mock tool manager"""
+    mock_manager.get_tool_definitions.return_value = _DEFAULT_TOOL_DEFS
+    mock_manager.execute_tool.return_value = "Mocked search results"
+    mock_manager.get_last_sources.return_value = _DEFAULT_SOURCES
+    mock_manager.get_last_source_metadata.return_value = _SAMPLE_SOURCE_METADATA
+    return mock_manager
 
 
-@pytest.fixture
-def test_app(mock_rag_system):
-    """Create test FastAPI app without static file mounting issues"""
-
-    from fastapi import FastAPI, HTTPException
-    from fastapi.middleware.cors import CORSMiddleware
-    from fastapi.middleware.trustedhost import TrustedHostMiddleware
-    from pydantic import BaseModel
-
-    # Create test app
-    app = FastAPI(title="Test Course Materials RAG System")
-
-    # Add middleware
-    app.add_middleware(TrustedHostMiddleware, allowed_hosts=["*"])
-    app.add_middleware(
-        CORSMiddleware,
-        allow_origins=["*"],
-        allow_credentials=True,
-        allow_methods=["*"],
-        allow_headers=["*"],
-        expose_headers=["*"],
-    )
-
-    # Pydantic models (inline to avoid import issues)
-    class QueryRequest(BaseModel):
-        query: str
-        session_id: str | None = None
-
-    class SourceMetadata(BaseModel):
-        name: str
-        course: str
-        lesson: int | None = None
-        link: str | None = None
-
-    class QueryResponse(BaseModel):
-        answer: str
-        sources: list[str]
-        source_metadata: list[SourceMetadata]
-        session_id: str
-
-    class CourseStats(BaseModel):
-        total_courses: int
-        course_titles: list[str]
-
-    # API endpoints
-    @app.post("/api/query", response_model=QueryResponse)
-    async def query_documents(request: QueryRequest):
-        try:
-            session_id = request.session_id
-            if not session_id:
-                session_id = mock_rag_system.session_manager.create_session()
-
-            answer, sources, source_metadata = mock_rag_system.query(
-                request.query, session_id
-            )
-            metadata_models = [SourceMetadata(**meta) for meta in source_metadata]
-
-            return QueryResponse(
-                answer=answer,
-                sources=sources,
-                source_metadata=metadata_models,
-                session_id=session_id,
-            )
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
-
-    @app.get("/api/courses", response_model=CourseStats)
-    async def get_course_stats():
-        try:
-            analytics = mock_rag_system.get_course_analytics()
-            return CourseStats(
-                total_courses=analytics["total_courses"],
-                course_titles=analytics["course_titles"],
-            )
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
-
-    return app
+# Mock shared by mock_tool_manager, specced on ToolManager; only reset
+# between tests
+_TOOL_MANAGER_TEMPLATE = _configure_tool_manager(NonCallableMagicMock(spec=ToolManager))
 
 
 @pytest.fixture
-def client(test_app):
-    """Create test client for API testing"""
-    from fastapi.testclient import TestClient
-
-    return TestClient(test_app)
-
+def mock_tool_manager():
+    """
+    Mock tool manager for testing.
 
-@pytest.fixture
-async def async_client(test_app):
-    """Create async test client for API testing"""
-    from httpx import AsyncClient
+    Every test receives the same module-level mock, with calls, return values
+    and side effects reset to the defaults first. The spec turns calls to
+    methods ToolManager doesn't have into AttributeErrors.
+    """
+    _TOOL_MANAGER_TEMPLATE.reset_mock(return_value=True, side_effect=True)
+    return _configure_tool_manager(_TOOL_MANAGER_TEMPLATE)
 
-    async with AsyncClient(app=test_app, base_url="http://test") as ac:
-        yield ac
 
+class FakeToolManager:
+    """
+    Plain stand-in for the parts of ToolManager that RAGSystem.query uses.
 
-@pytest.fixture
-def sample_query_request():
-    """Sample query request for API testing"""
-    return {"query": "What are Python variables?", "session_id": "test-session-123"}
+    Records the name of each method called in calls, in order.
+    """
 
+    __slots__ = ("sources", "metadata", "defs", "calls")
 
-@pytest.fixture
-def sample_query_request_no_session():
-    """Sample query request without session ID"""
-    return {"query": "What are Python data types?"}
+    def __init__(self, sources=(), metadata=(), defs=()):
+        self.sources = list(sources)
+        self.metadata = list(metadata)
+        self.defs = list(defs)
+        self.calls = []
 
+    def for_query(self):
+        self.calls.append("for_query")
+        return self
 
-@pytest.fixture
-def expected_query_response():
-    """Expected query response for API testing"""
-    return {
-        "answer": "This is a test response about Python variables.",
-        "sources": ["Python Programming Basics - Lesson 1"],
-        "source_metadata": [
-            {
-                "name": "Python Programming Basics - Lesson 1",
-                "course": "Python Programming Basics",
-                "lesson": 1,
-                "link": "https://example.com/lesson1",
-            }
-        ],
-        "session_id": "test-session-123",
-    }
+    def get_tool_definitions(self):
+        self.calls.append("get_tool_definitions")
+        return self.defs
 
+    def get_last_sources(self):
+        self.calls.append("get_last_sources")
+        return self.sources
 
-@pytest.fixture
-def expected_course_stats():
-    """Expected course statistics response"""
-    return {
-        "total_courses": 2,
-        "course_titles": ["Python Programming Basics", "Advanced Python"],
-    }
+    def get_last_source_metadata(self):
+        self.calls.append("get_last_source_metadata")
+        return self.metadata
 
 
 # Utility functions for test setup
-def setup_mock_chroma_results(
-    documents: list[str], metadata: list[dict], distances: list[float]
-):
-    """Helper to create mock ChromaDB results"""
-    return {"documents": [documents], "metadatas": [metadata], "distances": [distances]}
+def setup_mock_boto3():
+    """Helper to patch aioboto3 session creation"""
+    return patch("ai_generator.aioboto3.Session")
 
 
-def setup_mock_boto3():
-    """Helper to patch boto3 client creation"""
-    return patch("boto3.client")
+@pytest.fixture(scope="class")
+def patched_bedrock_session():
+    """Patch aioboto3 session creation once for a whole test class"""
+    with setup_mock_boto3() as session:
+        yield session
@@ -1,91 +1,107 @@
-from unittest.mock import Mock, patch
+import asyncio
+from collections import namedtuple
+from contextlib import ExitStack
+from unittest.mock import AsyncMock, Mock, patch
 
+import pytest
+from ai_generator import ROUND_BREAK
 from rag_system import RAGSystem
+from vector_store import SearchResults
+
+from tests.conftest import FakeToolManager
+
+# Class mocks standing in for the components RAGSystem builds, in the order
+# of _PATCHED_CLASSES
+RagMocks = namedtuple("RagMocks", "ai_gen vector_store doc_proc session_mgr")
+_PATCHED_CLASSES = ("AIGenerator", "VectorStore", "DocumentProcessor", "SessionManager")
+
+# Sources reported by the fake tool manager after a lesson 2 search
+_LESSON_2_SOURCES = ("Python Basics - Lesson 2",)
+_LESSON_2_METADATA = (
+    {"name": "Python Basics - Lesson 2", "course": "Python Basics", "lesson": 2},
+)
+
+
+@pytest.fixture(scope="class")
+def patched_rag_components():
+    """Patch the RAG system's component classes once for a whole test class"""
+    with ExitStack() as stack:
+        yield RagMocks(
+            *(
+                stack.enter_context(patch(f"rag_system.{name}"))
+                for name in _PATCHED_CLASSES
+            )
+        )
 
 
 class TestRAGSystemContentQueries:
     """Test how the RAG system handles content-query related questions"""
 
-    @patch("rag_system.AIGenerator")
-    @patch("rag_system.VectorStore")
-    @patch("rag_system.DocumentProcessor")
-    @patch("rag_system.SessionManager")
-    def test_content_query_workflow(
-        self,
-        mock_session_mgr,
-        mock_doc_proc,
-        mock_vector_store,
-        mock_ai_gen,
-        mock_config,
-    ):
+    @pytest.fixture(autouse=True)
+    def rag_mocks(self, patched_rag_components):
+        """Class mocks for this test, with return values reset to fresh mocks"""
+        for mock in patched_rag_components:
+            mock.reset_mock(return_value=True, side_effect=True)
+        return patched_rag_components
+
+    async def test_content_query_workflow(self, rag_mocks, mock_config):
         """Test end-to-end content query processing"""
         # Setup mocks
         mock_ai_instance = Mock()
+        mock_ai_instance.generate_response = AsyncMock()
         mock_ai_instance.generate_response.return_value = (
             "Variables in Python store data values."
         )
-        mock_ai_gen.return_value = mock_ai_instance
+        rag_mocks.ai_gen.return_value = mock_ai_instance
 
         mock_vector_instance = Mock()
-        mock_vector_store.return_value = mock_vector_instance
+        rag_mocks.vector_store.return_value = mock_vector_instance
 
         mock_session_instance = Mock()
         mock_session_instance.get_conversation_history.return_value = None
-        mock_session_mgr.return_value = mock_session_instance
+        rag_mocks.session_mgr.return_value = mock_session_instance
 
-        mock_tool_manager = Mock()
-        mock_tool_manager.get_last_sources.return_value = ["Python Basics - Lesson 2"]
-        mock_tool_manager.get_last_source_metadata.return_value = [
-            {"name": "Python Basics - Lesson 2", "course": "Python Basics", "lesson": 2}
-        ]
+        fake_manager = FakeToolManager(
+            sources=_LESSON_2_SOURCES, metadata=_LESSON_2_METADATA
+        )
 
         # Create RAG system
         rag_system = RAGSystem(mock_config)
-        rag_system.tool_manager = mock_tool_manager
+        rag_system.tool_manager = fake_manager
 
         # Test query
-        response, sources, metadata = rag_system.query("What are Python variables?")
+        response, sources, metadata = await rag_system.query(
+            "What are Python variables?"
+        )
 
         # Verify workflow
         assert response == "Variables in Python store data values."
         assert sources == ["Python Basics - Lesson 2"]
         assert len(metadata) == 1
         mock_ai_instance.generate_response.assert_called_once()
-        mock_tool_manager.get_last_sources.assert_called_once()
-        mock_tool_manager.reset_sources.assert_called_once()
-
-    @patch("rag_system.AIGenerator")
-    @patch("rag_system.VectorStore")
-    @patch("rag_system.DocumentProcessor")
-    @patch("rag_system.SessionManager")
-    def test_session_management_in_queries(
-        self,
-        mock_session_mgr,
-        mock_doc_proc,
-        mock_vector_store,
-        mock_ai_gen,
-        mock_config,
-    ):
+        assert fake_manager.calls.count("get_last_sources") == 1
+        assert fake_manager.calls.count("for_query") == 1
+
+    async def test_session_management_in_queries(self, rag_mocks, mock_config):
         """Test session management during queries"""
         mock_ai_instance = Mock()
+        mock_ai_instance.generate_response = AsyncMock()
         mock_ai_instance.generate_response.return_value = "Test response"
-        mock_ai_gen.return_value = mock_ai_instance
+        rag_mocks.ai_gen.return_value = mock_ai_instance
 
         mock_session_instance = Mock()
         mock_session_instance.get_conversation_history.return_value = (
             "Previous: context"
         )
-        mock_session_mgr.return_value = mock_session_instance
+        rag_mocks.session_mgr.return_value = mock_session_instance
 
-        mock_tool_manager = Mock()
-        mock_tool_manager.get_last_sources.return_value = []
-        mock_tool_manager.get_last_source_metadata.return_value = []
+        fake_manager = FakeToolManager()
 
         rag_system = RAGSystem(mock_config)
-        rag_system.tool_manager = mock_tool_manager
+        rag_system.tool_manager = fake_manager
 
         # Test with session ID
-        response, sources, metadata = rag_system.query(
+        response, sources, metadata = await rag_system.query(
             "Follow-up question", session_id="test_session"
         )
 
@@ -97,131 +113,199 @@ class TestRAGSystemContentQueries:
             "test_session", "Follow-up question", "Test response"
         )
 
-    @patch("rag_system.AIGenerator")
-    @patch("rag_system.VectorStore")
-    @patch("rag_system.DocumentProcessor")
-    @patch("rag_system.SessionManager")
-    def test_tool_definitions_passed_to_ai(
-        self,
-        mock_session_mgr,
-        mock_doc_proc,
-        mock_vector_store,
-        mock_ai_gen,
-        mock_config,
-    ):
+    async def test_tool_definitions_passed_to_ai(self, rag_mocks, mock_config):
         """Test that tool definitions are passed to AI generator"""
         mock_ai_instance = Mock()
-        mock_ai_gen.return_value = mock_ai_instance
+        mock_ai_instance.generate_response = AsyncMock()
+        rag_mocks.ai_gen.return_value = mock_ai_instance
 
-        mock_tool_manager = Mock()
-        mock_tool_definitions = [
+        tool_definitions = [
             {"name": "search_course_content", "description": "Search courses"}
         ]
-        mock_tool_manager.get_tool_definitions.return_value = mock_tool_definitions
-        mock_tool_manager.get_last_sources.return_value = []
-        mock_tool_manager.get_last_source_metadata.return_value = []
+        fake_manager = FakeToolManager(defs=tool_definitions)
 
         rag_system = RAGSystem(mock_config)
-        rag_system.tool_manager = mock_tool_manager
+        rag_system.tool_manager = fake_manager
 
-        rag_system.query("Test query")
+        await rag_system.query("Test query")
 
         # Verify tools passed to AI
         call_args = mock_ai_instance.generate_response.call_args
-        assert call_args[1]["tools"] == mock_tool_definitions
-        assert call_args[1]["tool_manager"] == mock_tool_manager
-
-    @patch("rag_system.AIGenerator")
-    @patch("rag_system.VectorStore")
-    @patch("rag_system.DocumentProcessor")
-    @patch("rag_system.SessionManager")
-    def test_source_reset_after_query(
-        self,
-        mock_session_mgr,
-        mock_doc_proc,
-        mock_vector_store,
-        mock_ai_gen,
-        mock_config,
-    ):
-        """Test that sources are reset after each query"""
+        assert call_args[1]["tools"] == tool_definitions
+        assert call_args[1]["tool_manager"] is fake_manager
+
+    async def test_sources_read_from_query_tools(self, rag_mocks, mock_config):
+        """Test that sources come from the tools set up for this query"""
         mock_ai_instance = Mock()
-        mock_ai_gen.return_value = mock_ai_instance
+        mock_ai_instance.generate_response = AsyncMock()
+        rag_mocks.ai_gen.return_value = mock_ai_instance
+
+        fake_manager = FakeToolManager(
+            sources=["Test Source"], metadata=[{"name": "Test"}]
+        )
+
+        rag_system = RAGSystem(mock_config)
+        rag_system.tool_manager = fake_manager
+
+        _, sources, metadata = await rag_system.query("Test query")
+
+        # Verify per-query tools were used, and no shared state was reset
+        assert fake_manager.calls == [
+            "for_query",
+            "get_tool_definitions",
+            "get_last_sources",
+            "get_last_source_metadata",
+        ]
+        assert sources == ["Test Source"]
+        assert metadata == [{"name": "Test"}]
+
+    async def test_concurrent_queries_keep_sources_apart(self, rag_mocks, mock_config):
+        """Test that concurrent queries each get the sources of their own searches"""
+        both_searched = asyncio.Barrier(2)
+
+        async def fake_generate(query, conversation_history, tools, tool_manager):
+            topic = query.rsplit(" ", 1)[-1]
+            await asyncio.to_thread(
+                tool_manager.execute_tool, "search_course_content", query=topic
+            )
+            # Read sources only after the other query has searched too
+            await both_searched.wait()
+            return f"Answer about {topic}"
 
-        mock_tool_manager = Mock()
-        mock_tool_manager.get_last_sources.return_value = ["Test Source"]
-        mock_tool_manager.get_last_source_metadata.return_value = [{"name": "Test"}]
+        mock_ai_instance = Mock()
+        mock_ai_instance.generate_response = AsyncMock(side_effect=fake_generate)
+        rag_mocks.ai_gen.return_value = mock_ai_instance
+
+        store = rag_mocks.vector_store.return_value
+        store.get_lesson_link.return_value = None
+        store.search.side_effect = lambda query, **kwargs: SearchResults(
+            documents=[f"{query} content"],
+            metadata=[{"course_title": f"Course for {query}", "lesson_number": 1}],
+            distances=[0.1],
+        )
 
         rag_system = RAGSystem(mock_config)
-        rag_system.tool_manager = mock_tool_manager
-
-        rag_system.query("Test query")
-
-        # Verify sources retrieved and then reset
-        mock_tool_manager.get_last_sources.assert_called_once()
-        mock_tool_manager.get_last_source_metadata.assert_called_once()
-        mock_tool_manager.reset_sources.assert_called_once()
-
-    @patch("rag_system.AIGenerator")
-    @patch("rag_system.VectorStore")
-    @patch("rag_system.DocumentProcessor")
-    @patch("rag_system.SessionManager")
-    def test_query_without_session(
-        self,
-        mock_session_mgr,
-        mock_doc_proc,
-        mock_vector_store,
-        mock_ai_gen,
-        mock_config,
-    ):
+        (answer_a, sources_a, _), (answer_b, sources_b, _) = await asyncio.gather(
+            rag_system.query("alpha"), rag_system.query("beta")
+        )
+
+        assert answer_a == "Answer about alpha"
+        assert sources_a == ["Course for alpha - Lesson 1"]
+        assert answer_b == "Answer about beta"
+        assert sources_b == ["Course for beta - Lesson 1"]
+        assert rag_system.search_tool.last_sources == []
+
+    async def test_query_without_session(self, rag_mocks, mock_config):
         """Test query processing without session ID"""
         mock_ai_instance = Mock()
+        mock_ai_instance.generate_response = AsyncMock()
         mock_ai_instance.generate_response.return_value = "No session response"
-        mock_ai_gen.return_value = mock_ai_instance
+        rag_mocks.ai_gen.return_value = mock_ai_instance
 
         mock_session_instance = Mock()
-        mock_session_mgr.return_value = mock_session_instance
+        rag_mocks.session_mgr.return_value = mock_session_instance
 
-        mock_tool_manager = Mock()
-        mock_tool_manager.get_last_sources.return_value = []
-        mock_tool_manager.get_last_source_metadata.return_value = []
+        fake_manager = FakeToolManager()
 
         rag_system = RAGSystem(mock_config)
-        rag_system.tool_manager = mock_tool_manager
+        rag_system.tool_manager = fake_manager
 
-        response, sources, metadata = rag_system.query("Test query")
+        response, sources, metadata = await rag_system.query("Test query")
 
         # Verify no session interactions
         mock_session_instance.get_conversation_history.assert_not_called()
         mock_session_instance.add_exchange.assert_not_called()
         assert response == "No session response"
 
-    @patch("rag_system.AIGenerator")
-    @patch("rag_system.VectorStore")
-    @patch("rag_system.DocumentProcessor")
-    @patch("rag_system.SessionManager")
-    def test_prompt_formatting(
-        self,
-        mock_session_mgr,
-        mock_doc_proc,
-        mock_vector_store,
-        mock_ai_gen,
-        mock_config,
-    ):
+    async def test_prompt_formatting(self, rag_mocks, mock_config):
         """Test that user query is properly formatted as prompt"""
         mock_ai_instance = Mock()
-        mock_ai_gen.return_value = mock_ai_instance
+        mock_ai_instance.generate_response = AsyncMock()
+        rag_mocks.ai_gen.return_value = mock_ai_instance
 
-        mock_tool_manager = Mock()
-        mock_tool_manager.get_last_sources.return_value = []
-        mock_tool_manager.get_last_source_metadata.return_value = []
+        fake_manager = FakeToolManager()
 
         rag_system = RAGSystem(mock_config)
-        rag_system.tool_manager = mock_tool_manager
+        rag_system.tool_manager = fake_manager
 
         user_query = "What are Python functions?"
-        rag_system.query(user_query)
+        await rag_system.query(user_query)
 
         # Verify prompt formatting
         call_args = mock_ai_instance.generate_response.call_args
         expected_prompt = f"Answer this question about course materials: {user_query}"
         assert call_args[1]["query"] == expected_prompt
+
+    async def test_query_stream_events(self, rag_mocks, mock_config):
+        """Test that streamed queries emit deltas, then sources, and save history"""
+
+        async def fake_stream(**kwargs):
+            for text in ("Variables ", "store data."):
+                yield text
+
+        mock_ai_instance = Mock()
+        mock_ai_instance.generate_response_stream = Mock(side_effect=fake_stream)
+        rag_mocks.ai_gen.return_value = mock_ai_instance
+
+        mock_session_instance = Mock()
+        mock_session_instance.get_conversation_history.return_value = None
+        rag_mocks.session_mgr.return_value = mock_session_instance
+
+        fake_manager = FakeToolManager(
+            sources=_LESSON_2_SOURCES, metadata=_LESSON_2_METADATA
+        )
+
+        rag_system = RAGSystem(mock_config)
+        rag_system.tool_manager = fake_manager
+
+        events = [
+            event
+            async for event in rag_system.query_stream(
+                "What are variables?", session_id="test_session"
+            )
+        ]
+
+        assert events[:2] == [
+            {"type": "delta", "text": "Variables "},
+            {"type": "delta", "text": "store data."},
+        ]
+        assert events[2]["type"] == "done"
+        assert events[2]["sources"] == ["Python Basics - Lesson 2"]
+        assert fake_manager.calls.count("for_query") == 1
+        mock_session_instance.add_exchange.assert_called_once_with(
+            "test_session", "What are variables?", "Variables store data."
+        )
+
+    async def test_query_stream_saves_only_final_answer(self, rag_mocks, mock_config):
+        """Test that a streamed lead-in is shown apart but kept out of history"""
+
+        async def fake_stream(**kwargs):
+            for text in ("Let me search.", ROUND_BREAK, "Variables store data."):
+                yield text
+
+        mock_ai_instance = Mock()
+        mock_ai_instance.generate_response_stream = Mock(side_effect=fake_stream)
+        rag_mocks.ai_gen.return_value = mock_ai_instance
+
+        mock_session_instance = Mock()
+        mock_session_instance.get_conversation_history.return_value = None
+        rag_mocks.session_mgr.return_value = mock_session_instance
+
+        rag_system = RAGSystem(mock_config)
+        rag_system.tool_manager = FakeToolManager()
+
+        events = [
+            event
+            async for event in rag_system.query_stream(
+                "What are variables?", session_id="test_session"
+            )
+        ]
+
+        assert events[:3] == [
+            {"type": "delta", "text": "Let me search."},
+            {"type": "delta", "text": "\n\n"},
+            {"type": "delta", "text": "Variables store data."},
+        ]
+        mock_session_instance.add_exchange.assert_called_once_with(
+            "test_session", "What are variables?", "Variables store data."
+        )
@@ -1,69 +1,82 @@
-from search_tools import CourseSearchTool, ToolManager
+import pytest
+
+# (query, course_name, lesson_number) searches that find the sample results
+SUCCESSFUL_SEARCHES = (
+    pytest.param("Python variables", None, None, id="no_filter"),
+    pytest.param("Python basics", "Python Programming", None, id="course_filter"),
+    pytest.param("variables", "Python Programming", 2, id="lesson_filter"),
+)
+
+# (query, course_name, results fixture, expected output) searches that fail
+FAILED_SEARCHES = (
+    pytest.param(
+        "nonexistent topic",
+        None,
+        "empty_search_results",
+        "No relevant content found.",
+        id="empty_results",
+    ),
+    pytest.param(
+        "anything",
+        "Nonexistent Course",
+        "unknown_course_search_results",
+        "No course found matching 'Nonexistent Course'",
+        id="invalid_course",
+    ),
+    pytest.param(
+        "test query",
+        None,
+        "error_search_results",
+        "Test error message",
+        id="search_error",
+    ),
+)
 
 
 class TestCourseSearchTool:
     """Test the CourseSearchTool execute method outputs"""
 
-    def test_successful_search_with_results(
-        self, mock_vector_store, sample_search_results
+    @pytest.mark.parametrize("query,course,lesson", SUCCESSFUL_SEARCHES)
+    def test_execute_finds_results(
+        self,
+        query,
+        course,
+        lesson,
+        search_tool,
+        mock_vector_store,
+        sample_search_results,
     ):
-        """Test successful search that returns results"""
+        """Test that a search with or without filters formats its results"""
         mock_vector_store.search.return_value = sample_search_results
-        tool = CourseSearchTool(mock_vector_store)
 
-        result = tool.execute("Python variables")
-
-        assert "Python Programming Basics" in result
-        assert "Lesson 1" in result
-        assert len(tool.last_sources) == 2
-        assert tool.last_sources[0] == "Python Programming Basics - Lesson 1"
-
-    def test_search_with_course_filter(self, mock_vector_store, sample_search_results):
-        """Test search with course name filter"""
-        mock_vector_store.search.return_value = sample_search_results
-        tool = CourseSearchTool(mock_vector_store)
-
-        result = tool.execute("variables", course_name="Python Programming")
+        result = search_tool.execute(query, course_name=course, lesson_number=lesson)
 
         mock_vector_store.search.assert_called_once_with(
-            query="variables", course_name="Python Programming", lesson_number=None
+            query=query, course_name=course, lesson_number=lesson
         )
         assert "Python Programming Basics" in result
+        assert "Lesson 1" in result
+        assert len(search_tool.last_sources) == 2
+        assert search_tool.last_sources[0] == "Python Programming Basics - Lesson 1"
 
-    def test_search_with_lesson_filter(self, mock_vector_store, sample_search_results):
-        """Test search with lesson number filter"""
-        mock_vector_store.search.return_value = sample_search_results
-        tool = CourseSearchTool(mock_vector_store)
+    @pytest.mark.parametrize("query,course,results,expected", FAILED_SEARCHES)
+    def test_execute_reports_failures(
+        self, request, query, course, results, expected, search_tool, mock_vector_store
+    ):
+        """Test that empty results, unknown courses and store errors are reported"""
+        mock_vector_store.search.return_value = request.getfixturevalue(results)
 
-        tool.execute("variables", course_name="Python Programming", lesson_number=2)
+        result = search_tool.execute(query, course_name=course)
 
         mock_vector_store.search.assert_called_once_with(
-            query="variables", course_name="Python Programming", lesson_number=2
+            query=query, course_name=course, lesson_number=None
         )
+        assert result == expected
+        assert search_tool.last_sources == []
 
-    def test_empty_search_results(self, mock_vector_store, empty_search_results):
-        """Test handling of empty search results"""
-        mock_vector_store.search.return_value = empty_search_results
-        tool = CourseSearchTool(mock_vector_store)
-
-        result = tool.execute("nonexistent topic")
-
-        assert "No relevant content found" in result
-        assert len(tool.last_sources) == 0
-
-    def test_search_error_handling(self, mock_vector_store, error_search_results):
-        """Test handling of search errors"""
-        mock_vector_store.search.return_value = error_search_results
-        tool = CourseSearchTool(mock_vector_store)
-
-        result = tool.execute("test query")
-
-        assert result == "Test error message"
-
-    def test_tool_definition_structure(self, mock_vector_store):
+    def test_tool_definition_structure(self, search_tool):
         """Test that tool definition has required structure"""
-        tool = CourseSearchTool(mock_vector_store)
-        definition = tool.get_tool_definition()
+        definition = search_tool.get_tool_definition()
 
         assert definition["name"] == "search_course_content"
         assert "description" in definition
@@ -74,53 +87,57 @@ class TestCourseSearchTool:
 class TestToolManager:
     """Test the ToolManager functionality"""
 
-    def test_tool_registration(self, mock_vector_store):
+    def test_tool_registration(self, tool_manager):
         """Test registering a tool"""
-        manager = ToolManager()
-        tool = CourseSearchTool(mock_vector_store)
-
-        manager.register_tool(tool)
-
-        assert "search_course_content" in manager.tools
-        definitions = manager.get_tool_definitions()
+        assert "search_course_content" in tool_manager.tools
+        definitions = tool_manager.get_tool_definitions()
         assert len(definitions) == 1
         assert definitions[0]["name"] == "search_course_content"
 
-    def test_tool_execution(self, mock_vector_store, sample_search_results):
+    def test_tool_execution(
+        self, tool_manager, mock_vector_store, sample_search_results
+    ):
         """Test executing a tool through the manager"""
         mock_vector_store.search.return_value = sample_search_results
-        manager = ToolManager()
-        tool = CourseSearchTool(mock_vector_store)
-        manager.register_tool(tool)
 
-        result = manager.execute_tool("search_course_content", query="test")
+        result = tool_manager.execute_tool("search_course_content", query="test")
 
         assert "Python Programming Basics" in result
 
-    def test_source_tracking(self, mock_vector_store, sample_search_results):
+    def test_source_tracking(
+        self, tool_manager, mock_vector_store, sample_search_results
+    ):
         """Test source tracking and retrieval"""
         mock_vector_store.search.return_value = sample_search_results
-        manager = ToolManager()
-        tool = CourseSearchTool(mock_vector_store)
-        manager.register_tool(tool)
 
-        manager.execute_tool("search_course_content", query="test")
-        sources = manager.get_last_sources()
-        metadata = manager.get_last_source_metadata()
+        tool_manager.execute_tool("search_course_content", query="test")
+        sources = tool_manager.get_last_sources()
+        metadata = tool_manager.get_last_source_metadata()
 
         assert len(sources) == 2
         assert len(metadata) == 2
         assert sources[0] == "Python Programming Basics - Lesson 1"
 
-    def test_source_reset(self, mock_vector_store, sample_search_results):
+    def test_source_reset(self, tool_manager, mock_vector_store, sample_search_results):
         """Test resetting sources after retrieval"""
         mock_vector_store.search.return_value = sample_search_results
-        manager = ToolManager()
-        tool = CourseSearchTool(mock_vector_store)
-        manager.register_tool(tool)
 
-        manager.execute_tool("search_course_content", query="test")
-        manager.reset_sources()
+        tool_manager.execute_tool("search_course_content", query="test")
+        tool_manager.reset_sources()
+
+        assert tool_manager.get_last_sources() == []
+        assert tool_manager.get_last_source_metadata() == []
+
+    def test_for_query_copies_tools(
+        self, tool_manager, search_tool, mock_vector_store, sample_search_results
+    ):
+        """Test that a per-query manager tracks sources apart from the shared one"""
+        mock_vector_store.search.return_value = sample_search_results
+
+        query_manager = tool_manager.for_query()
+        query_manager.execute_tool("search_course_content", query="test")
 
-        assert manager.get_last_sources() == []
-        assert manager.get_last_source_metadata() == []
+        assert len(query_manager.get_last_sources()) == 2
+        assert tool_manager.get_last_sources() == []
+        assert search_tool.last_sources == []
+        assert query_manager.get_tool_definitions() is tool_manager.tool_definitions
@@ -100,7 +100,7 @@ async function sendMessage() {
     chatMessages.scrollTop = chatMessages.scrollHeight;
 
     try {
-        const response = await fetch(`${API_URL}/query`, {
+        const response = await fetch(`${API_URL}/query/stream`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -111,18 +111,29 @@ async function sendMessage() {
             })
         });
 
-        if (!response.ok) throw new Error('Query failed');
+        if (!response.ok || !response.body) throw new Error('Query failed');
 
-        const data = await response.json();
-        
-        // Update session ID if new
-        if (!currentSessionId) {
-            currentSessionId = data.session_id;
-        }
+        // Render text as it streams in, then the final message with sources
+        const contentDiv = loadingMessage.querySelector('.message-content');
+        let answer = '';
 
-        // Replace loading message with response
-        loadingMessage.remove();
-        addMessage(data.answer, 'assistant', data.sources, data.source_metadata);
+        await readEventStream(response, (event) => {
+            if (event.type === 'delta') {
+                answer += event.text;
+                contentDiv.innerHTML = marked.parse(answer);
+                chatMessages.scrollTop = chatMessages.scrollHeight;
+            } else if (event.type === 'done') {
+                // Update session ID if new
+                if (!currentSessionId) {
+                    currentSessionId = event.session_id;
+                }
+
+                loadingMessage.remove();
+                addMessage(answer, 'assistant', event.sources, event.source_metadata);
+            } else if (event.type === 'error') {
+                throw new Error(event.detail);
+            }
+        });
 
     } catch (error) {
         // Replace loading message with error
@@ -135,6 +146,28 @@ async function sendMessage() {
     }
 }
 
+// Read a server-sent event stream, calling onEvent with each parsed data payload
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+
+        for (const event of events) {
+            if (event.startsWith('data: ')) {
+                onEvent(JSON.parse(event.slice('data: '.length)));
+            }
+        }
+    }
+}
+
 function createLoadingMessage() {
     const messageDiv = document.createElement('div');
     messageDiv.className = 'message assistant';
@@ -13,4 +13,4 @@ echo "Starting Course Materials RAG System..."
 echo "Make sure you have configured AWS credentials and set AWS_REGION in .env"
 
 # Change to backend directory and start the server
-cd backend && uv run uvicorn app:app --reload --port 8000
\ No newline at end of file
+cd backend && ENV="${ENV:-dev}" uv run uvicorn app:app --reload --port 8000
\ No newline at end of file